@@ -1,7 +1,7 @@
 #%%
 from pathlib import Path
 import openeo
-from .utils import execute_and_update_reference
+from .utils import execute_and_update_reference, get_reference_raster_path
 
 def main():
     auth_connection = openeo.connect(url="openeo.dataspace.copernicus.eu").authenticate_oidc()
@@ -27,7 +27,8 @@ def main():
         method='mean')
 
 
-    execute_and_update_reference(cube, output_path, scenario_name, json_name)
+    execute_and_update_reference(cube, output_path, scenario_name, json_name,
+                                 reference_raster_path=get_reference_raster_path(scenario_name, must_exist=False))
 
 
 if __name__ == "__main__":
@@ -3,10 +3,14 @@ import geojson
 import geopandas as gpd
 import numpy as np
 import requests
-import xarray as xr
 from openeo.processes import if_, is_nan
 
-from .utils import calculate_cube_statistics, extract_reference_statistics
+from .utils import (
+    compare_scenario_with_reference_raster,
+    execute_and_calculate_statistics,
+    extract_reference_statistics,
+    get_compared_statistics,
+)
 from .testing import approxify
 
 from .utils_BAP import (
@@ -20,6 +24,7 @@ from .utils_BAP import (
 
 
 TOLERANCE = 0.01
+MISMATCH_TOLERANCE = 0.01
 
 #Below we list the regression tests on common operations in openEO.
 #Note, the assert is specifically kept in the test file for tracibility in Jenkins
@@ -49,18 +54,14 @@ def test_aggregate_spatial(auth_connection, tmp_path):
         reducer='mean')
     
     # Excecute and assert
-    cube.execute_batch(outputfile=output_path,
-                        title=scenario_name,
-                        description='benchmarking-creo',
-                        job_options={'driver-memory': '1g'}
-                        )
-
-    output_cube = xr.open_dataset(output_path)
-    output_dict = calculate_cube_statistics(output_cube)
-    groundtruth_dict = extract_reference_statistics(scenario_name)
+    output_dict = execute_and_calculate_statistics(cube, output_path, scenario_name)
+    groundtruth_dict = extract_reference_statistics(scenario_name, statistics=get_compared_statistics())
 
     assert output_dict == approxify(groundtruth_dict, rel=TOLERANCE)
 
+    error_map = compare_scenario_with_reference_raster(output_path, scenario_name, rel_tol=TOLERANCE)
+    assert error_map is None or float(error_map['mismatch_fraction'].max()) <= MISMATCH_TOLERANCE
+
 
 def test_apply_kernel(auth_connection, tmp_path):
 
@@ -86,18 +87,14 @@ def test_apply_kernel(auth_connection, tmp_path):
         factor=factor)
     
     # Excecute and Assert
-    cube.execute_batch(outputfile=output_path,
-                        title=scenario_name,
-                        description='benchmarking-creo',
-                        job_options={'driver-memory': '1g'}
-                        )
-
-    output_cube = xr.open_dataset(output_path)
-    output_dict = calculate_cube_statistics(output_cube)
-    groundtruth_dict = extract_reference_statistics(scenario_name)
+    output_dict = execute_and_calculate_statistics(cube, output_path, scenario_name)
+    groundtruth_dict = extract_reference_statistics(scenario_name, statistics=get_compared_statistics())
 
     assert output_dict == approxify(groundtruth_dict, rel=TOLERANCE)
 
+    error_map = compare_scenario_with_reference_raster(output_path, scenario_name, rel_tol=TOLERANCE)
+    assert error_map is None or float(error_map['mismatch_fraction'].max()) <= MISMATCH_TOLERANCE
+
 
 
 def test_downsample_spatial(auth_connection, tmp_path):
@@ -119,18 +116,14 @@ def test_downsample_spatial(auth_connection, tmp_path):
         method='mean')
 
     # Excecute and assert
-    cube.execute_batch(outputfile=output_path,
-                        title=scenario_name,
-                        description='benchmarking-creo',
-                        job_options={'driver-memory': '1g'}
-                        )
-
-    output_cube = xr.open_dataset(output_path)
-    output_dict = calculate_cube_statistics(output_cube)
-    groundtruth_dict = extract_reference_statistics(scenario_name)
+    output_dict = execute_and_calculate_statistics(cube, output_path, scenario_name)
+    groundtruth_dict = extract_reference_statistics(scenario_name, statistics=get_compared_statistics())
 
     assert output_dict == approxify(groundtruth_dict, rel=TOLERANCE)
 
+    error_map = compare_scenario_with_reference_raster(output_path, scenario_name, rel_tol=TOLERANCE)
+    assert error_map is None or float(error_map['mismatch_fraction'].max()) <= MISMATCH_TOLERANCE
+
 
 
 def test_upsample_spatial(auth_connection, tmp_path):
@@ -152,18 +145,14 @@ def test_upsample_spatial(auth_connection, tmp_path):
         method='mean')
     
     # Excecute and apply
-    cube.execute_batch(outputfile=output_path,
-                        title=scenario_name,
-                        description='benchmarking-creo',
-                        job_options={'driver-memory': '1g'}
-                        )
-
-    output_cube = xr.open_dataset(output_path)
-    output_dict = calculate_cube_statistics(output_cube)
-    groundtruth_dict = extract_reference_statistics(scenario_name)
+    output_dict = execute_and_calculate_statistics(cube, output_path, scenario_name)
+    groundtruth_dict = extract_reference_statistics(scenario_name, statistics=get_compared_statistics())
 
     assert output_dict == approxify(groundtruth_dict, rel=TOLERANCE)
 
+    error_map = compare_scenario_with_reference_raster(output_path, scenario_name, rel_tol=TOLERANCE)
+    assert error_map is None or float(error_map['mismatch_fraction'].max()) <= MISMATCH_TOLERANCE
+
 
 
 def test_reduce_time(auth_connection, tmp_path):
@@ -185,18 +174,14 @@ def test_reduce_time(auth_connection, tmp_path):
         reducer='mean')
 
     # Excecute and assert
-    cube.execute_batch(outputfile=output_path,
-                        title=scenario_name,
-                        description='benchmarking-creo',
-                        job_options={'driver-memory': '1g'}
-                        )
-
-    output_cube = xr.open_dataset(output_path)
-    output_dict = calculate_cube_statistics(output_cube)
-    groundtruth_dict = extract_reference_statistics(scenario_name)
+    output_dict = execute_and_calculate_statistics(cube, output_path, scenario_name)
+    groundtruth_dict = extract_reference_statistics(scenario_name, statistics=get_compared_statistics())
 
     assert output_dict == approxify(groundtruth_dict, rel=TOLERANCE)
 
+    error_map = compare_scenario_with_reference_raster(output_path, scenario_name, rel_tol=TOLERANCE)
+    assert error_map is None or float(error_map['mismatch_fraction'].max()) <= MISMATCH_TOLERANCE
+
 
 
 def test_mask_scl(auth_connection, tmp_path):
@@ -221,18 +206,14 @@ def test_mask_scl(auth_connection, tmp_path):
     cube.mask(cloud_mask)
 
     # Excecute and assert
-    cube.execute_batch(outputfile=output_path,
-                        title=scenario_name,
-                        description='benchmarking-creo',
-                        job_options={'driver-memory': '1g'}
-                        )
-
-    output_cube = xr.open_dataset(output_path)
-    output_dict = calculate_cube_statistics(output_cube)
-    groundtruth_dict = extract_reference_statistics(scenario_name)
+    output_dict = execute_and_calculate_statistics(cube, output_path, scenario_name)
+    groundtruth_dict = extract_reference_statistics(scenario_name, statistics=get_compared_statistics())
 
     assert output_dict == approxify(groundtruth_dict, rel=TOLERANCE)
 
+    error_map = compare_scenario_with_reference_raster(output_path, scenario_name, rel_tol=TOLERANCE)
+    assert error_map is None or float(error_map['mismatch_fraction'].max()) <= MISMATCH_TOLERANCE
+
 
 
 def test_BAP(auth_connection, tmp_path):
@@ -304,17 +285,13 @@ def test_BAP(auth_connection, tmp_path):
 
     
     # Excecute and assert
-    cube.execute_batch(outputfile=output_path,
-                        title=scenario_name,
-                        description='benchmarking-creo',
-                        job_options={'driver-memory': '1g'}
-                        )
-
-    output_cube = xr.open_dataset(output_path)
-    output_dict = calculate_cube_statistics(output_cube)
-    groundtruth_dict = extract_reference_statistics(scenario_name)
+    output_dict = execute_and_calculate_statistics(cube, output_path, scenario_name)
+    groundtruth_dict = extract_reference_statistics(scenario_name, statistics=get_compared_statistics())
 
     assert output_dict == approxify(groundtruth_dict, rel=TOLERANCE)
 
+    error_map = compare_scenario_with_reference_raster(output_path, scenario_name, rel_tol=TOLERANCE)
+    assert error_map is None or float(error_map['mismatch_fraction'].max()) <= MISMATCH_TOLERANCE
+
     
 
@@ -0,0 +1,345 @@
+import json
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+from openeo.internal.graph_building import PGNode
+from openeo.metadata import Band, BandDimension, CollectionMetadata, SpatialDimension, TemporalDimension
+from openeo.rest.datacube import DataCube
+
+from . import utils
+from .utils import (
+    add_statistics_to_graph,
+    compare_scenario_with_reference_raster,
+    compare_with_reference_raster,
+    execute_and_calculate_statistics,
+    execute_batch_resumable,
+    find_resumable_job,
+    load_journal,
+    parse_backend_statistics,
+    record_job,
+    write_reference_raster,
+)
+
+
+class DummyJob:
+    def __init__(self, job_id: str, status: str = 'created', create_kwargs: dict = None, result: dict = None):
+        self.job_id = job_id
+        self._status = status
+        self.create_kwargs = create_kwargs or {}
+        self.result = result
+        self.started = False
+        self.downloaded_to = None
+
+    def status(self) -> str:
+        return self._status
+
+    def start_and_wait(self):
+        self.started = True
+        self._status = 'finished'
+        return self
+
+    def get_results(self):
+        return self
+
+    def download_file(self, target):
+        self.downloaded_to = target
+        if self.result is not None:
+            with open(target, 'w') as file:
+                json.dump(self.result, file)
+
+
+class DummyConnection:
+    def __init__(self, jobs: dict):
+        self.jobs = jobs
+
+    def job(self, job_id: str) -> DummyJob:
+        return self.jobs[job_id]
+
+
+class DummyCube:
+    def __init__(self, connection: DummyConnection, graph: dict = None, result: dict = None):
+        self.connection = connection
+        self.graph = graph or {'loadcollection1': {'process_id': 'load_collection', 'result': True}}
+        self.result = result
+        self.created_jobs = []
+
+    def flat_graph(self) -> dict:
+        return self.graph
+
+    def create_job(self, **kwargs) -> DummyJob:
+        job = DummyJob(f'j-new{len(self.created_jobs)}', create_kwargs=kwargs, result=self.result)
+        self.created_jobs.append(job)
+        return job
+
+
+@pytest.fixture
+def journal_path(tmp_path, monkeypatch):
+    journal_path = tmp_path / 'journal' / 'benchmark_journal.json'
+    monkeypatch.setenv('OPENEO_BENCHMARK_JOURNAL', str(journal_path))
+    return journal_path
+
+
+def test_record_job(journal_path):
+    record_job(journal_path, 'scenario', job_id='j-123', status='created')
+    record_job(journal_path, 'scenario', status='running')
+
+    entry = load_journal(journal_path)['scenario']
+    assert entry['job_id'] == 'j-123'
+    assert entry['status'] == 'running'
+
+
+def test_load_journal_corrupt(journal_path):
+    journal_path.parent.mkdir()
+    journal_path.write_text('{"scenario": ')
+
+    assert load_journal(journal_path) == {}
+
+
+@pytest.mark.parametrize('status', ['queued', 'running', 'finished'])
+def test_find_resumable_job_reattach(journal_path, status):
+    job = DummyJob('j-123', status=status)
+    cube = DummyCube(DummyConnection({'j-123': job}))
+    record_job(journal_path, 'scenario', job_id='j-123', graph_hash='abc', status='running', submitted=time.time())
+
+    assert find_resumable_job(cube, 'scenario', 'abc', journal_path) is job
+
+
+@pytest.mark.parametrize('status', ['error', 'canceled'])
+def test_find_resumable_job_backend_failed(journal_path, status):
+    cube = DummyCube(DummyConnection({'j-123': DummyJob('j-123', status=status)}))
+    record_job(journal_path, 'scenario', job_id='j-123', graph_hash='abc', status='running', submitted=time.time())
+
+    assert find_resumable_job(cube, 'scenario', 'abc', journal_path) is None
+
+
+def test_find_resumable_job_journal_error_still_running(journal_path):
+    job = DummyJob('j-123', status='running')
+    cube = DummyCube(DummyConnection({'j-123': job}))
+    record_job(journal_path, 'scenario', job_id='j-123', graph_hash='abc', status='error', submitted=time.time())
+
+    assert find_resumable_job(cube, 'scenario', 'abc', journal_path) is job
+
+
+def test_find_resumable_job_graph_changed(journal_path):
+    cube = DummyCube(DummyConnection({'j-123': DummyJob('j-123', status='running')}))
+    record_job(journal_path, 'scenario', job_id='j-123', graph_hash='abc', status='running', submitted=time.time())
+
+    assert find_resumable_job(cube, 'scenario', 'def', journal_path) is None
+
+
+def test_find_resumable_job_too_old(journal_path):
+    cube = DummyCube(DummyConnection({'j-123': DummyJob('j-123', status='running')}))
+    record_job(journal_path, 'scenario', job_id='j-123', graph_hash='abc', status='running',
+               submitted=time.time() - 13 * 3600)
+
+    assert find_resumable_job(cube, 'scenario', 'abc', journal_path) is None
+
+
+def test_find_resumable_job_without_submitted(journal_path):
+    cube = DummyCube(DummyConnection({'j-123': DummyJob('j-123', status='running')}))
+    record_job(journal_path, 'scenario', job_id='j-123', graph_hash='abc', status='running')
+
+    assert find_resumable_job(cube, 'scenario', 'abc', journal_path) is None
+
+
+def test_find_resumable_job_downloaded(journal_path):
+    cube = DummyCube(DummyConnection({'j-123': DummyJob('j-123', status='finished')}))
+    record_job(journal_path, 'scenario', job_id='j-123', graph_hash='abc', status='downloaded',
+               submitted=time.time())
+
+    assert find_resumable_job(cube, 'scenario', 'abc', journal_path) is None
+
+
+def test_execute_batch_resumable(journal_path, tmp_path):
+    cube = DummyCube(DummyConnection({}))
+
+    execute_batch_resumable(cube, tmp_path / 'output.nc', 'scenario')
+
+    job, = cube.created_jobs
+    assert job.create_kwargs['out_format'] == 'netCDF'
+    assert job.started
+    assert job.downloaded_to == tmp_path / 'output.nc'
+    assert load_journal(journal_path)['scenario']['status'] == 'downloaded'
+
+
+def test_execute_and_calculate_statistics_backend(journal_path, tmp_path, monkeypatch):
+    monkeypatch.setenv('OPENEO_BENCHMARK_STATISTICS', 'backend')
+    result = {'B02:sum': 30.0, 'B02:count': 3, 'B02:min': 5.0, 'B02:max': 15.0}
+    statistics_cube = DummyCube(DummyConnection({}), result=result)
+    monkeypatch.setattr(utils, 'add_statistics_to_graph', lambda cube: statistics_cube)
+    metadata = CollectionMetadata({}, dimensions=[BandDimension(name='bands', bands=[Band('B02')])])
+    cube = DataCube(PGNode('load_collection', id='SENTINEL2_L2A'), connection=None, metadata=metadata)
+
+    output_dict = execute_and_calculate_statistics(cube, tmp_path / 'output.nc', 'scenario')
+
+    job, = statistics_cube.created_jobs
+    assert job.create_kwargs['out_format'] == 'JSON'
+    assert job.downloaded_to == tmp_path / 'output.json'
+    assert output_dict == {'B02': {'mean': 10.0, 'min': 5.0, 'max': 15.0}}
+
+
+def test_execute_batch_resumable_reattach(journal_path, tmp_path):
+    job = DummyJob('j-123', status='finished')
+    cube = DummyCube(DummyConnection({'j-123': job}))
+    execute_batch_resumable(cube, tmp_path / 'output.nc', 'scenario')
+    entry = load_journal(journal_path)['scenario']
+    record_job(journal_path, 'scenario', job_id='j-123', status='finished')
+
+    execute_batch_resumable(cube, tmp_path / 'output.nc', 'scenario')
+
+    assert len(cube.created_jobs) == 1
+    assert not job.started
+    assert job.downloaded_to == tmp_path / 'output.nc'
+    assert load_journal(journal_path)['scenario']['graph_hash'] == entry['graph_hash']
+
+
+def test_execute_batch_resumable_client_error(journal_path, tmp_path):
+    class DisconnectingCube(DummyCube):
+        def create_job(self, **kwargs) -> DummyJob:
+            job = super().create_job(**kwargs)
+            job.start_and_wait = lambda: (_ for _ in ()).throw(ConnectionError('connection dropped'))
+            return job
+
+    cube = DisconnectingCube(DummyConnection({}))
+
+    with pytest.raises(ConnectionError):
+        execute_batch_resumable(cube, tmp_path / 'output.nc', 'scenario')
+
+    assert load_journal(journal_path)['scenario']['status'] == 'running'
+
+
+def test_parse_backend_statistics():
+    result = {
+        'B03:sum': 60.0, 'B02:sum': [30.0], 'B03:count': 3, 'B02:count': 3,
+        'B02:min': 5.0, 'B03:min': 10.0, 'B02:max': 15.0, 'B03:max': 30.0,
+    }
+
+    assert parse_backend_statistics(result, ['B02', 'B03']) == {
+        'B02': {'mean': 10.0, 'min': 5.0, 'max': 15.0},
+        'B03': {'mean': 20.0, 'min': 10.0, 'max': 30.0},
+    }
+
+
+def test_parse_backend_statistics_missing_label():
+    with pytest.raises(ValueError, match="No value for 'B02:sum'"):
+        parse_backend_statistics({'B02:count': 3, 'B02:min': 5.0, 'B02:max': 15.0}, ['B02'])
+
+
+def test_parse_backend_statistics_nodata():
+    result = {'B02:sum': 30.0, 'B02:count': 3, 'B02:min': None, 'B02:max': 15.0}
+
+    with pytest.raises(ValueError, match="Expected a numeric value for 'B02:min'"):
+        parse_backend_statistics(result, ['B02'])
+
+
+def test_add_statistics_to_graph():
+    metadata = CollectionMetadata({}, dimensions=[
+        TemporalDimension(name='t', extent=['2020-01-01', '2020-02-01']),
+        BandDimension(name='bands', bands=[Band('B02'), Band('B03')]),
+        SpatialDimension(name='y', extent=[0, 1]),
+        SpatialDimension(name='x', extent=[0, 1]),
+    ])
+    cube = DataCube(PGNode('load_collection', id='SENTINEL2_L2A'), connection=None, metadata=metadata)
+
+    statistics_cube = add_statistics_to_graph(cube)
+
+    assert statistics_cube.metadata.dimension_names() == ['bands']
+    assert statistics_cube.metadata.band_names == [
+        f'{band_name}:{reduction}' for reduction in ('sum', 'count', 'min', 'max') for band_name in ('B02', 'B03')
+    ]
+    reducers = [
+        (node['arguments']['dimension'], next(iter(node['arguments']['reducer']['process_graph'].values()))['process_id'])
+        for node in statistics_cube.flat_graph().values() if node['process_id'] == 'reduce_dimension'
+    ]
+    assert reducers == [
+        ('t', 'sum'), ('y', 'sum'), ('x', 'sum'),
+        ('t', 'count'), ('y', 'sum'), ('x', 'sum'),
+        ('t', 'min'), ('y', 'min'), ('x', 'min'),
+        ('t', 'max'), ('y', 'max'), ('x', 'max'),
+    ]
+
+
+def create_cube(data: np.ndarray = None, dims: tuple = ('t', 'y', 'x'), t_offset: int = 0) -> xr.Dataset:
+    if data is None:
+        data = np.random.default_rng(42).random((2, 40, 30)) * 1000
+    coords = {
+        't': pd.date_range('2020-01-01', periods=data.shape[0]) + pd.Timedelta(days=t_offset),
+        'y': np.arange(40) * 10.0,
+        'x': np.arange(30) * 10.0,
+    }
+    cube = xr.Dataset({'B02': (('t', 'y', 'x'), data)}, coords=coords)
+    return cube.transpose(*dims)
+
+
+@pytest.fixture
+def reference_path(tmp_path, monkeypatch):
+    monkeypatch.setenv('OPENEO_BENCHMARK_REFERENCE_RASTERS', str(tmp_path / 'reference_rasters'))
+    reference_path = tmp_path / 'reference_rasters' / 'scenario.nc'
+    write_reference_raster(create_cube(), reference_path, block_size=16)
+    return reference_path
+
+
+def test_compare_with_reference_raster_round_trip(tmp_path, reference_path):
+    create_cube().to_netcdf(tmp_path / 'output.nc')
+
+    error_map = compare_with_reference_raster(tmp_path / 'output.nc', reference_path, block_size=16)
+
+    assert dict(error_map.sizes) == {'band': 1, 'y_block': 3, 'x_block': 2}
+    assert 0 < float(error_map['max_abs_error'].max()) <= 0.01
+    assert float(error_map['mismatch_fraction'].max()) == 0
+
+
+def test_compare_with_reference_raster_transposed(tmp_path, reference_path):
+    create_cube(dims=('t', 'x', 'y')).to_netcdf(tmp_path / 'output.nc')
+
+    error_map = compare_with_reference_raster(tmp_path / 'output.nc', reference_path, block_size=16)
+
+    assert float(error_map['mismatch_fraction'].max()) == 0
+
+
+def test_compare_with_reference_raster_shifted(tmp_path, reference_path):
+    create_cube(t_offset=10).to_netcdf(tmp_path / 'output.nc')
+
+    with pytest.raises(ValueError, match='Coordinates of dimension t'):
+        compare_with_reference_raster(tmp_path / 'output.nc', reference_path, block_size=16)
+
+
+def test_compare_with_reference_raster_nodata_mismatch(tmp_path, reference_path):
+    data = create_cube()['B02'].values.copy()
+    data[:, :5, :5] = np.nan
+    create_cube(data).to_netcdf(tmp_path / 'output.nc')
+
+    error_map = compare_with_reference_raster(tmp_path / 'output.nc', reference_path, block_size=16)
+
+    mismatch_fraction = error_map['mismatch_fraction'].sel(band='B02').values
+    assert mismatch_fraction[0, 0] == pytest.approx(25 / 256)
+    assert mismatch_fraction.sum() == mismatch_fraction[0, 0]
+
+
+def test_compare_scenario_with_reference_raster(tmp_path, reference_path):
+    data = create_cube()['B02'].values.copy()
+    data[1, 20:25, 20:25] += 100
+    create_cube(data).to_netcdf(tmp_path / 'output.nc')
+
+    error_map = compare_scenario_with_reference_raster(tmp_path / 'output.nc', 'scenario')
+
+    assert (tmp_path / 'error_map.nc').exists()
+    assert float(error_map['mismatch_fraction'].max()) == pytest.approx(25 / (2 * 40 * 30))
+
+
+def test_compare_scenario_with_reference_raster_missing(tmp_path, reference_path):
+    create_cube().to_netcdf(tmp_path / 'output.nc')
+
+    assert compare_scenario_with_reference_raster(tmp_path / 'output.nc', 'other_scenario') is None
+    assert not (tmp_path / 'error_map.nc').exists()
+
+
+def test_compare_scenario_with_reference_raster_vector(tmp_path, reference_path):
+    vector_cube = xr.Dataset({'B02': (('feature', 't'), np.ones((3, 2)))})
+    vector_cube.to_netcdf(tmp_path / 'output.nc')
+    write_reference_raster(vector_cube, reference_path)
+
+    assert compare_scenario_with_reference_raster(tmp_path / 'output.nc', 'scenario') is None
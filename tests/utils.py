@@ -1,23 +1,51 @@
 #%%
+import hashlib
 import json
 import logging
+import os
+import time
 from pathlib import Path
-from typing import Union
+from typing import Optional, Union
 
 import numpy as np
 import openeo
 import xarray as xr
+from openeo.util import guess_format
 
 # Configure logging
 _log = logging.getLogger(__name__)
 
+JOB_DESCRIPTION = 'benchmarking-creo'
+JOB_OPTIONS = {'driver-memory': '1g'}
 
-def extract_reference_statistics(scenario_name: str) -> dict:
+# Statistics compared against the reference
+STATISTICS = ('mean', 'min', 'max', 'quantile25', 'quantile50', 'quantile75')
+
+# Statistics that can be calculated exactly on the backend, from the reductions below
+BACKEND_STATISTICS = ('mean', 'min', 'max')
+
+# Reductions calculated on the backend, with the reducer of the first and of the subsequent dimensions
+BACKEND_REDUCTIONS = {
+    'sum': ('sum', 'sum'),
+    'count': ('count', 'sum'),
+    'min': ('min', 'min'),
+    'max': ('max', 'max'),
+}
+
+# Dimensions that are read in blocks when comparing against a reference raster
+SPATIAL_DIMENSIONS = ('y', 'x')
+
+# Journal entries in one of these states can be picked up again by a rerun
+RESUMABLE_JOB_STATUSES = ('created', 'queued', 'running', 'finished')
+
+
+def extract_reference_statistics(scenario_name: str, statistics: Optional[tuple] = None) -> dict:
     """
     Loads reference data from a JSON file for a specific scenario.
 
     Parameters:
         scenario_name (str): The name of the scenario for which reference data is needed.
+        statistics (Optional[tuple]): The statistics to load for each band, all statistics if not given.
 
     Returns:
         dict: The reference data for the specified scenario.
@@ -32,7 +60,12 @@ def extract_reference_statistics(scenario_name: str) -> dict:
     
     for scenario_data in all_reference_data:
         if scenario_data['scenario_name'] == scenario_name:
-            return scenario_data['reference_data']
+            if statistics is None:
+                return scenario_data['reference_data']
+            return {
+                band_name: {statistic: band_statistics[statistic] for statistic in statistics}
+                for band_name, band_statistics in scenario_data['reference_data'].items()
+            }
     
     raise ValueError(f"No reference data found for scenario '{scenario_name}' in file '{reference_file}'.")
 
@@ -50,9 +83,8 @@ def calculate_cube_statistics(hypercube: xr.Dataset) -> dict:
               and quantile statistics.
     """
     statistics = {}
-    band_names = [band_name for band_name in hypercube.data_vars if band_name != 'crs']
 
-    for band_name in band_names:
+    for band_name in _band_names(hypercube):
         band_data = hypercube[band_name]
         mean_value = np.round(float(band_data.mean()),2)
         min_value = np.round(float(band_data.min()),2)
@@ -72,6 +104,525 @@ def calculate_cube_statistics(hypercube: xr.Dataset) -> dict:
 
     return statistics
 
+# functionality for resuming batch jobs after an interrupted run
+
+def get_journal_path() -> Path:
+    """
+    Returns the location of the job checkpoint journal.
+
+    The journal is kept in the working directory by default, set `OPENEO_BENCHMARK_JOURNAL`
+    to keep it somewhere that survives a workspace cleanup (e.g. on a Jenkins agent).
+    """
+    return Path(os.environ.get('OPENEO_BENCHMARK_JOURNAL', 'benchmark_journal.json'))
+
+
+def load_journal(journal_path: Union[str, Path]) -> dict:
+    """
+    Loads the job checkpoint journal, keyed by scenario name.
+
+    Parameters:
+        journal_path (Union[str, Path]): Location of the journal file.
+
+    Returns:
+        dict: The journal entries, or an empty dict if there is no (readable) journal yet.
+    """
+    journal_path = Path(journal_path)
+    if not journal_path.exists():
+        return {}
+
+    try:
+        with open(journal_path, 'r') as file:
+            return json.load(file)
+    except json.JSONDecodeError:
+        _log.warning(f'Ignoring corrupt job journal {journal_path}')
+        return {}
+
+
+def record_job(journal_path: Union[str, Path], scenario_name: str, **fields) -> None:
+    """
+    Updates the journal entry of a scenario and writes the journal to disk.
+
+    The journal is written to a temporary file first and then moved in place,
+    so that a process dying halfway through a write does not corrupt it.
+
+    Parameters:
+        journal_path (Union[str, Path]): Location of the journal file.
+        scenario_name (str): The name of the scenario to update.
+        **fields: The fields to set on the entry (e.g. job_id, graph_hash, status).
+    """
+    journal_path = Path(journal_path)
+    journal_path.parent.mkdir(parents=True, exist_ok=True)
+    journal = load_journal(journal_path)
+    journal.setdefault(scenario_name, {}).update(fields, updated=time.time())
+
+    tmp_path = journal_path.with_name(journal_path.name + '.tmp')
+    with open(tmp_path, 'w') as file:
+        json.dump(journal, file, indent=4)
+    os.replace(tmp_path, journal_path)
+
+
+def calculate_graph_hash(cube: openeo.DataCube, out_format: Optional[str] = None) -> str:
+    """
+    Calculates a stable hash of the process graph, output format and job options of a cube,
+    used to check whether a journaled job still corresponds to the scenario.
+    """
+    graph = {'process_graph': cube.flat_graph(), 'out_format': out_format, 'job_options': JOB_OPTIONS}
+    return hashlib.sha256(json.dumps(graph, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def find_resumable_job(cube: openeo.DataCube,
+                       scenario_name: str,
+                       graph_hash: str,
+                       journal_path: Union[str, Path]
+                       ) -> Optional[openeo.BatchJob]:
+    """
+    Looks up a job from an earlier, interrupted run that can be reattached to.
+
+    A job is only reused if it was submitted for the same process graph, is not older than
+    `OPENEO_BENCHMARK_JOURNAL_MAX_AGE` hours (default 12), its result was not downloaded yet and
+    it is still running or finished on the backend. The status recorded in the journal is not trusted
+    otherwise, as it may be outdated: failed, canceled or unknown jobs on the backend are resubmitted.
+
+    Returns:
+        Optional[openeo.BatchJob]: The job to reattach to, or None if the scenario has to be resubmitted.
+    """
+    entry = load_journal(journal_path).get(scenario_name)
+    if entry is None:
+        return None
+
+    max_age = float(os.environ.get('OPENEO_BENCHMARK_JOURNAL_MAX_AGE') or 12) * 3600
+    if entry.get('graph_hash') != graph_hash:
+        _log.info(f'Process graph of {scenario_name} changed since job {entry["job_id"]}, resubmitting')
+        return None
+    if entry.get('status') == 'downloaded' or time.time() - entry.get('submitted', 0) > max_age:
+        return None
+
+    job = cube.connection.job(entry['job_id'])
+    try:
+        status = job.status()
+    except openeo.rest.OpenEoApiError as e:
+        _log.warning(f'Could not get status of journaled job {entry["job_id"]}: {e}')
+        return None
+
+    if status not in RESUMABLE_JOB_STATUSES:
+        _log.info(f'Journaled job {entry["job_id"]} of {scenario_name} has status {status}, resubmitting')
+        return None
+
+    _log.info(f'Reattaching to job {entry["job_id"]} of {scenario_name} (status {status})')
+    return job
+
+
+def execute_batch_resumable(cube: openeo.DataCube,
+                            output_path: Union[str, Path],
+                            scenario_name: str,
+                            out_format: Optional[str] = None
+                            ) -> None:
+    """
+    Execute the provided OpenEO cube as a batch job and download the result to the output path,
+    reattaching to a job of an earlier, interrupted run where possible.
+
+    The job id, graph hash and status are recorded in the checkpoint journal (see `get_journal_path`)
+    as soon as the job is created, and updated as the job progresses. Once the result is downloaded,
+    the entry is marked as downloaded so that the next run computes the scenario from scratch again.
+
+    Parameters:
+        cube (openeo.datacube.DataCube): The OpenEO data cube to execute.
+        output_path (Union[str, Path]): The path where the output should be saved.
+        scenario_name (str): A name identifying the scenario, used as job title and journal key.
+        out_format (Optional[str]): The output format of the job, guessed from the output path if not given
+                                    (e.g. netCDF for '.nc'), like `execute_batch` does.
+
+    Returns:
+        None
+    """
+    out_format = out_format or guess_format(output_path)
+    journal_path = get_journal_path()
+    graph_hash = calculate_graph_hash(cube, out_format)
+
+    job = find_resumable_job(cube, scenario_name, graph_hash, journal_path)
+    if job is None:
+        job = cube.create_job(out_format=out_format,
+                              title=scenario_name,
+                              description=JOB_DESCRIPTION,
+                              job_options=JOB_OPTIONS
+                              )
+        record_job(journal_path, scenario_name,
+                   job_id=job.job_id, graph_hash=graph_hash, status='created', submitted=time.time())
+
+    if job.status() != 'finished':
+        record_job(journal_path, scenario_name, status='running')
+        try:
+            job.start_and_wait()
+        except openeo.rest.JobFailedException:
+            # Only a failure reported by the backend is final, client side errors (e.g. connection
+            # issues) leave the job running, so that a rerun can still reattach to it.
+            record_job(journal_path, scenario_name, status='error')
+            raise
+        record_job(journal_path, scenario_name, status='finished')
+
+    job.get_results().download_file(target=output_path)
+    record_job(journal_path, scenario_name, status='downloaded')
+
+# functionality for calculating the statistics on the backend
+
+def get_statistics_mode() -> str:
+    """
+    Returns where the cube statistics are calculated, as configured with `OPENEO_BENCHMARK_STATISTICS`:
+    'local' (default) downloads the full output cube, 'backend' only downloads the statistics.
+    """
+    mode = os.environ.get('OPENEO_BENCHMARK_STATISTICS', 'local')
+    if mode not in ('local', 'backend'):
+        raise ValueError(f"Invalid statistics mode '{mode}', expected 'local' or 'backend'.")
+    return mode
+
+
+def get_compared_statistics() -> tuple:
+    """
+    Returns the statistics compared against the reference in the configured statistics mode.
+    Only statistics that can be calculated exactly on the backend are compared in 'backend' mode.
+    """
+    return BACKEND_STATISTICS if get_statistics_mode() == 'backend' else STATISTICS
+
+
+def add_statistics_to_graph(cube: openeo.DataCube) -> openeo.DataCube:
+    """
+    Extends the process graph of a cube so that it reduces to the sum, count, min and max of each band.
+
+    Every reduction is applied to all non-band dimensions one after the other with `reduce_dimension`,
+    after which the band labels are renamed to '<band>:<reduction>' and the results are merged into
+    a single cube with only a band dimension. These reductions can be chained without loss of accuracy,
+    unlike a mean (with nodata) or quantiles, so the mean is derived from the sum and count afterwards.
+
+    Parameters:
+        cube (openeo.datacube.DataCube): The OpenEO data cube of the scenario.
+
+    Returns:
+        openeo.datacube.DataCube: A data cube with the reductions as band labels.
+    """
+    band_dimension = cube.metadata.band_dimension.name
+    band_names = cube.metadata.band_names
+    dimensions = [dimension for dimension in cube.metadata.dimension_names() if dimension != band_dimension]
+
+    statistics_cube = None
+    for reduction, (reducer, chained_reducer) in BACKEND_REDUCTIONS.items():
+        reduced = cube
+        for index, dimension in enumerate(dimensions):
+            reduced = reduced.reduce_dimension(dimension=dimension, reducer=chained_reducer if index else reducer)
+        reduced = reduced.rename_labels(dimension=band_dimension,
+                                        target=[f'{band_name}:{reduction}' for band_name in band_names],
+                                        source=band_names)
+        statistics_cube = reduced if statistics_cube is None else statistics_cube.merge_cubes(reduced)
+
+    return statistics_cube
+
+
+def _collect_labelled_values(result, values: dict) -> dict:
+    """Collects all key-value pairs of the (nested) dicts in a JSON result."""
+    if isinstance(result, dict):
+        for key, value in result.items():
+            values[key] = value
+            _collect_labelled_values(value, values)
+    elif isinstance(result, list):
+        for item in result:
+            _collect_labelled_values(item, values)
+    return values
+
+
+def parse_backend_statistics(result: Union[dict, list], band_names: list) -> dict:
+    """
+    Converts the JSON result of a cube built with `add_statistics_to_graph`
+    to the same format as `calculate_cube_statistics`, restricted to `BACKEND_STATISTICS`.
+
+    Parameters:
+        result (Union[dict, list]): The parsed JSON result of the batch job.
+        band_names (list): The band names of the scenario cube.
+
+    Returns:
+        dict: A dictionary containing mean, min and max statistics for each band.
+
+    Raises:
+        ValueError: If a '<band>:<reduction>' label is missing or has no (single) numeric value.
+    """
+    labelled_values = _collect_labelled_values(result, {})
+
+    def get_value(band_name: str, reduction: str) -> float:
+        label = f'{band_name}:{reduction}'
+        if label not in labelled_values:
+            raise ValueError(f"No value for '{label}' in backend result.")
+        value = labelled_values[label]
+        while isinstance(value, list) and len(value) == 1:
+            value = value[0]
+        if not isinstance(value, (int, float)):
+            raise ValueError(f"Expected a numeric value for '{label}' in backend result, got {value!r}.")
+        return float(value)
+
+    statistics = {}
+    for band_name in band_names:
+        count = get_value(band_name, 'count')
+        if count == 0:
+            raise ValueError(f"Band '{band_name}' has no valid pixels in backend result.")
+        statistics[band_name] = {
+            'mean': np.round(get_value(band_name, 'sum') / count, 2),
+            'min': np.round(get_value(band_name, 'min'), 2),
+            'max': np.round(get_value(band_name, 'max'), 2),
+        }
+
+    return statistics
+
+
+def execute_and_calculate_statistics(cube: openeo.DataCube,
+                                     output_path: Union[str, Path],
+                                     scenario_name: str
+                                     ) -> dict:
+    """
+    Execute the provided OpenEO cube and calculate the statistics of each band.
+
+    In 'local' mode (see `get_statistics_mode`) the full output cube is downloaded to the output path and
+    reduced with `calculate_cube_statistics`. In 'backend' mode the statistics are added to the process graph
+    and only the resulting JSON is downloaded, next to the output path. Cubes without band metadata
+    (e.g. vector cubes) and scenarios with a reference raster (see `get_reference_raster_path`) are
+    always downloaded in full. Only the statistics of `get_compared_statistics` are returned.
+
+    Parameters:
+        cube (openeo.datacube.DataCube): The OpenEO data cube to execute.
+        output_path (Union[str, Path]): The path where the output should be saved.
+        scenario_name (str): A name identifying the scenario.
+
+    Returns:
+        dict: A dictionary containing the compared statistics for each band.
+    """
+    if get_statistics_mode() == 'backend' and get_reference_raster_path(scenario_name) is not None:
+        _log.info(f'Downloading the full cube of {scenario_name} to compare against its reference raster')
+    elif get_statistics_mode() == 'backend':
+        if isinstance(cube, openeo.DataCube) and cube.metadata is not None and cube.metadata.has_band_dimension():
+            statistics_path = Path(output_path).with_suffix('.json')
+            execute_batch_resumable(add_statistics_to_graph(cube), statistics_path, scenario_name, out_format='JSON')
+            with open(statistics_path, 'r') as file:
+                return parse_backend_statistics(json.load(file), cube.metadata.band_names)
+        _log.warning(f'Cannot calculate statistics of {scenario_name} on the backend, downloading the full cube')
+
+    execute_batch_resumable(cube, output_path, scenario_name)
+
+    output_cube = xr.open_dataset(output_path)
+    output_dict = calculate_cube_statistics(output_cube)
+    return {
+        band_name: {statistic: band_statistics[statistic] for statistic in get_compared_statistics()}
+        for band_name, band_statistics in output_dict.items()
+    }
+
+# functionality for comparing against reference rasters
+
+def get_reference_raster_path(scenario_name: str, must_exist: bool = True) -> Optional[Path]:
+    """
+    Returns the location of the reference raster of a scenario, if reference rasters are enabled by
+    setting `OPENEO_BENCHMARK_REFERENCE_RASTERS` to the directory containing them.
+
+    Parameters:
+        scenario_name (str): The name of the scenario.
+        must_exist (bool): Whether to return None if there is no reference raster for the scenario (yet).
+    """
+    reference_dir = os.environ.get('OPENEO_BENCHMARK_REFERENCE_RASTERS')
+    if not reference_dir:
+        return None
+
+    reference_path = Path(reference_dir) / f'{scenario_name}.nc'
+    if must_exist and not reference_path.exists():
+        _log.info(f'No reference raster for {scenario_name} in {reference_dir}')
+        return None
+    return reference_path
+
+
+def _band_names(hypercube: xr.Dataset) -> list:
+    return [band_name for band_name in hypercube.data_vars if band_name != 'crs']
+
+
+def _has_spatial_dimensions(hypercube: xr.Dataset) -> bool:
+    return all(dim in hypercube.dims for dim in SPATIAL_DIMENSIONS)
+
+
+def _check_coordinates(output_band: xr.DataArray, reference_band: xr.DataArray) -> None:
+    """Raises a ValueError if the coordinate labels of an output band differ from the reference band."""
+    for dim in reference_band.dims:
+        if dim not in reference_band.coords:
+            continue
+        if dim not in output_band.coords:
+            raise ValueError(f'Output of {reference_band.name} has no coordinates for dimension {dim}.')
+
+        output_labels, reference_labels = output_band[dim].values, reference_band[dim].values
+        if np.issubdtype(reference_labels.dtype, np.floating):
+            equal = np.allclose(output_labels, reference_labels)
+        else:
+            equal = np.array_equal(output_labels, reference_labels)
+        if not equal:
+            raise ValueError(f'Coordinates of dimension {dim} of {reference_band.name} do not match the reference.')
+
+
+def _block_sizes(hypercube: xr.Dataset, band_name: str, block_size: int) -> dict:
+    """
+    Returns the block size along each dimension of a band: spatial dimensions are split in blocks of
+    `block_size`, other dimensions are read one label at a time (or at once if there are no spatial dimensions).
+    """
+    dims = hypercube[band_name].dims
+    has_spatial = any(dim in SPATIAL_DIMENSIONS for dim in dims)
+    return {
+        dim: min(block_size, hypercube.sizes[dim]) if dim in SPATIAL_DIMENSIONS
+        else (1 if has_spatial else hypercube.sizes[dim])
+        for dim in dims
+    }
+
+
+def _iterate_blocks(sizes: dict, block_sizes: dict):
+    """Yields the block index and `isel` indexer of every block of an array with the given dimension sizes."""
+    for block_index in np.ndindex(*[-(-sizes[dim] // block_sizes[dim]) for dim in block_sizes]):
+        yield dict(zip(block_sizes, block_index)), {
+            dim: slice(index * block_sizes[dim], (index + 1) * block_sizes[dim])
+            for dim, index in zip(block_sizes, block_index)
+        }
+
+
+def write_reference_raster(hypercube: xr.Dataset,
+                           reference_path: Union[str, Path],
+                           least_significant_digit: int = 2,
+                           block_size: int = 256
+                           ) -> None:
+    """
+    Writes an output cube as compressed reference raster.
+
+    Floating point bands are quantized to `least_significant_digit` decimals, and all bands are compressed
+    with zlib in chunks matching the blocks read by `compare_with_reference_raster`.
+
+    Parameters:
+        hypercube (xarray.Dataset): Output cube obtained through opening a netCDF file using xarray.Dataset.
+        reference_path (Union[str, Path]): The path where the reference raster should be saved.
+        least_significant_digit (int): Number of decimals retained for floating point bands.
+        block_size (int): Size of the chunks along the spatial dimensions.
+    """
+    encoding = {}
+    for band_name in _band_names(hypercube):
+        band_encoding = {
+            key: value for key, value in hypercube[band_name].encoding.items()
+            if key in ('dtype', '_FillValue', 'scale_factor', 'add_offset')
+        }
+        band_encoding.update(
+            zlib=True,
+            complevel=4,
+            chunksizes=tuple(_block_sizes(hypercube, band_name, block_size).values()),
+        )
+        if np.issubdtype(band_encoding.get('dtype', hypercube[band_name].dtype), np.floating):
+            band_encoding['least_significant_digit'] = least_significant_digit
+        encoding[band_name] = band_encoding
+
+    Path(reference_path).parent.mkdir(parents=True, exist_ok=True)
+    hypercube.to_netcdf(reference_path, engine='netcdf4', encoding=encoding)
+
+
+def compare_with_reference_raster(output_path: Union[str, Path],
+                                  reference_path: Union[str, Path],
+                                  rel_tol: float = 0.01,
+                                  abs_tol: float = 0.01,
+                                  block_size: int = 256
+                                  ) -> xr.Dataset:
+    """
+    Compares an output cube pixel by pixel against its reference raster.
+
+    Both files are read lazily, one block at a time, so that memory use is bounded by the block size
+    rather than the size of the cube. The output is read in the axis order of the reference, and its
+    coordinate labels have to match those of the reference. Pixels mismatch if their nodata mask differs,
+    or if their difference exceeds `abs_tol + rel_tol * abs(reference)`.
+
+    Parameters:
+        output_path (Union[str, Path]): The path of the output cube.
+        reference_path (Union[str, Path]): The path of the reference raster.
+        rel_tol (float): Relative tolerance on the pixel values.
+        abs_tol (float): Absolute tolerance on the pixel values.
+        block_size (int): Size of the blocks along the spatial dimensions.
+
+    Returns:
+        xarray.Dataset: The error map, with per block `max_abs_error`, `mean_abs_error` and `mismatch_fraction`
+                        for each band. Spatial dimensions are downsampled to one value per block (`y_block`,
+                        `x_block`), other dimensions are aggregated.
+
+    Raises:
+        ValueError: If the bands, dimensions or coordinates of the output cube and reference raster differ.
+    """
+    with xr.open_dataset(output_path) as output_cube, xr.open_dataset(reference_path) as reference_cube:
+        band_names = _band_names(reference_cube)
+        if _band_names(output_cube) != band_names:
+            raise ValueError(f'Bands {_band_names(output_cube)} do not match reference bands {band_names}.')
+
+        error_maps = []
+        for band_name in band_names:
+            output_band, reference_band = output_cube[band_name], reference_cube[band_name]
+            if dict(output_band.sizes) != dict(reference_band.sizes):
+                raise ValueError(f'Dimensions {dict(output_band.sizes)} of {band_name} do not match '
+                                 f'reference dimensions {dict(reference_band.sizes)}.')
+            output_band = output_band.transpose(*reference_band.dims)
+            _check_coordinates(output_band, reference_band)
+
+            block_sizes = _block_sizes(reference_cube, band_name, block_size)
+            map_dims = [dim for dim in block_sizes if dim in SPATIAL_DIMENSIONS]
+            map_shape = [-(-reference_band.sizes[dim] // block_sizes[dim]) for dim in map_dims]
+            max_error, error_sum = np.zeros(map_shape), np.zeros(map_shape)
+            valid_count, mismatch_count, pixel_count = np.zeros(map_shape), np.zeros(map_shape), np.zeros(map_shape)
+
+            for block_index, indexer in _iterate_blocks(reference_band.sizes, block_sizes):
+                output_block = output_band.isel(indexer).values.astype(np.float64)
+                reference_block = reference_band.isel(indexer).values.astype(np.float64)
+
+                valid = ~np.isnan(output_block) & ~np.isnan(reference_block)
+                error = np.abs(output_block - reference_block)[valid]
+                mismatch = np.isnan(output_block) != np.isnan(reference_block)
+                mismatch[valid] = error > abs_tol + rel_tol * np.abs(reference_block[valid])
+
+                map_index = tuple(block_index[dim] for dim in map_dims)
+                if error.size:
+                    max_error[map_index] = max(max_error[map_index], error.max())
+                error_sum[map_index] += error.sum()
+                valid_count[map_index] += error.size
+                mismatch_count[map_index] += mismatch.sum()
+                pixel_count[map_index] += mismatch.size
+
+            block_dims = [f'{dim}_block' for dim in map_dims]
+            error_maps.append(xr.Dataset({
+                'max_abs_error': (block_dims, max_error),
+                'mean_abs_error': (block_dims, np.divide(error_sum, valid_count,
+                                                         out=np.zeros(map_shape), where=valid_count > 0)),
+                'mismatch_fraction': (block_dims, mismatch_count / pixel_count),
+            }).expand_dims(band=[band_name]))
+
+    return xr.concat(error_maps, dim='band')
+
+
+def compare_scenario_with_reference_raster(output_path: Union[str, Path],
+                                           scenario_name: str,
+                                           rel_tol: float = 0.01
+                                           ) -> Optional[xr.Dataset]:
+    """
+    Compares the output cube of a scenario against its reference raster (see `get_reference_raster_path`),
+    and saves the resulting error map as `error_map.nc` next to the output.
+
+    Parameters:
+        output_path (Union[str, Path]): The path of the output cube.
+        scenario_name (str): The name of the scenario.
+        rel_tol (float): Relative tolerance on the pixel values.
+
+    Returns:
+        Optional[xarray.Dataset]: The error map (see `compare_with_reference_raster`), or None if reference rasters
+                                  are disabled, the scenario has no reference raster or its output has no spatial dimensions.
+    """
+    reference_path = get_reference_raster_path(scenario_name)
+    if reference_path is None:
+        return None
+
+    with xr.open_dataset(output_path) as output_cube:
+        if not _has_spatial_dimensions(output_cube):
+            _log.info(f'Not comparing {scenario_name} against its reference raster, as its output has no spatial dimensions')
+            return None
+
+    error_map = compare_with_reference_raster(output_path, reference_path, rel_tol=rel_tol)
+    error_map.to_netcdf(Path(output_path).with_name('error_map.nc'))
+    return error_map
+
 # functionality for updating the reference
 
 def update_json(json_name:str, scenario_name:str, new_statistics:dict):
@@ -108,7 +659,8 @@ def update_json(json_name:str, scenario_name:str, new_statistics:dict):
 def execute_and_update_reference(cube: openeo.DataCube, 
                        output_path: Union[str, Path], 
                        scenario_name: str,
-                       json_name:str
+                       json_name:str,
+                       reference_raster_path: Optional[Union[str, Path]] = None
                        ) -> None:
     """
     Execute the provided OpenEO cube, save the result to the output path, 
@@ -118,6 +670,8 @@ def execute_and_update_reference(cube: openeo.DataCube,
         cube (openeo.datacube.DataCube): The OpenEO data cube to execute.
         output_path (Union[str, Path]): The path where the output should be saved.
         scenario_name (str): A name identifying the scenario for reference data.
+        reference_raster_path (Optional[Union[str, Path]]): If given, outputs with spatial dimensions are also saved
+                                                            as reference raster.
 
     Returns:
         None
@@ -126,12 +680,11 @@ def execute_and_update_reference(cube: openeo.DataCube,
         RuntimeError: If there is an issue during execution, file saving, or assertion.
     """
     
-    cube.execute_batch(outputfile=output_path,
-                        title=scenario_name,
-                        description='benchmarking-creo',
-                        job_options={'driver-memory': '1g'}
-                        )
+    execute_batch_resumable(cube, output_path, scenario_name)
 
     output_cube = xr.open_dataset(output_path)
     output_dict = calculate_cube_statistics(output_cube)
     update_json(json_name, scenario_name, output_dict)
+
+    if reference_raster_path is not None and _has_spatial_dimensions(output_cube):
+        write_reference_raster(output_cube, reference_raster_path)